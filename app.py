@@ -1,18 +1,24 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import numpy as np
 from dashboard_utils import (
     load_and_preprocess_griegas,
     load_and_preprocess_inusual,
+    category_isin_mask,
+    type_masks,
+    compute_strike_aggregates,
     calculate_put_call_ratio,
-    calculate_money_at_risk,
     calculate_max_pain,
+    calculate_money_at_risk,
     calculate_gex,
     calculate_vega_exposure,
-    calculate_theta_exposure
+    calculate_theta_exposure,
+    warmup_kernels
 )
 
 # --- Configuración de la Página ---
@@ -24,13 +30,23 @@ st.set_page_config(
 )
 
 # --- Tema Oscuro de Plotly ---
-# Más adelante, al crear figuras: template="plotly_dark"
+# Plantilla por defecto para todas las figuras: se resuelve una vez aquí y no en cada update_layout
+pio.templates.default = "plotly_dark"
 
 # --- Carga y Cacheo de Datos ---
+def get_data_version(filepath):
+    """Devuelve el mtime del archivo para invalidar los cachés cuando el CSV cambia."""
+    try:
+        return os.path.getmtime(filepath)
+    except OSError:
+        return None
+
 @st.cache_data # Cachear para mejorar rendimiento
-def load_data():
-    df_griegas = load_and_preprocess_griegas(filepath='Griegas.csv')
-    df_inusual = load_and_preprocess_inusual(filepath='Inusual.csv')
+def load_data(griegas_version=None, inusual_version=None):
+    # griegas_version/inusual_version solo forman parte de la clave del caché
+    # Los loaders reutilizan su caché Parquet en .cache/ mientras el CSV no cambie
+    df_griegas = load_and_preprocess_griegas('Griegas.csv')
+    df_inusual = load_and_preprocess_inusual('Inusual.csv')
 
     # Asegurarse de que las columnas clave para cálculos no tengan NaNs o manejarlos
     if df_griegas is not None:
@@ -51,18 +67,71 @@ def load_data():
 
     return df_griegas, df_inusual
 
-df_griegas, df_inusual = load_data()
+@st.cache_resource
+def warmup_numba_kernels():
+    # Una vez por proceso del servidor: el JIT (o la carga del caché de Numba, si está instalado) ocurre al arrancar
+    # y no en la primera interacción del usuario
+    warmup_kernels()
+
+warmup_numba_kernels()
+
+griegas_version = get_data_version('Griegas.csv')
+inusual_version = get_data_version('Inusual.csv')
+df_griegas, df_inusual = load_data(griegas_version, inusual_version)
+
+# --- Cacheo de Métricas por Vencimiento ---
+# Los argumentos con prefijo '_' no se hashean: la clave del caché es el vencimiento
+# seleccionado más la versión del CSV, así los cambios en los filtros de la sección
+# Inusual no recalculan las métricas de la cadena.
+@st.cache_data
+def get_strike_aggregates(exp_key, data_version, _df):
+    # Todas las sumas por strike en una sola pasada (StrikeAggs): alimenta el gráfico de Volumen/OI, los P/C ratios y las exposiciones
+    return compute_strike_aggregates(_df)
+
+@st.cache_data
+def get_put_call_ratios(exp_key, data_version, _df):
+    # Ratios por strike desde la agregación cacheada; el total, con sumas directas sobre todas las filas
+    strike_aggregates = get_strike_aggregates(exp_key, data_version, _df)
+    return (calculate_put_call_ratio(_df, group_by_strike=True, strike_aggregates=strike_aggregates),
+            calculate_put_call_ratio(_df, group_by_strike=False))
+
+@st.cache_data
+def get_max_pain(exp_key, data_version, _df):
+    # Sin dropna previo: calculate_max_pain ya descarta las filas con Strike, Type u OpenInterest NaN
+    return calculate_max_pain(_df)
+
+@st.cache_data
+def get_all_exposures(exp_key, data_version, _df):
+    # GEX, Vega, Theta y Dinero en Riesgo son vistas de los agregados por strike ya cacheados
+    strike_aggregates = get_strike_aggregates(exp_key, data_version, _df)
+    gex_df, gamma_flip_point = calculate_gex(_df, strike_aggregates)
+    return (calculate_money_at_risk(_df, strike_aggregates), gex_df, gamma_flip_point,
+            calculate_vega_exposure(_df, strike_aggregates), calculate_theta_exposure(_df, strike_aggregates))
+
+@st.cache_data
+def get_iv_by_type(exp_key, data_version, _df):
+    # IV media por (Strike, Type) en una sola pasada; columnas 'call' y 'put'
+    return (_df.groupby(['Strike', 'Type'], observed=True, sort=False)['IV'].mean()
+            .unstack('Type').reindex(columns=['call', 'put']).sort_index())
+
+@st.cache_data
+def get_unique_sorted(data_version, column, _series):
+    # Opciones de los multiselect: se calculan una vez por versión del CSV, no en cada rerun
+    return sorted(_series.dropna().unique().tolist())
 
 # --- Barra Lateral de Filtros (Opcional por ahora, se puede añadir después) ---
 st.sidebar.header("Filtros")
 # --- Barra Lateral de Filtros ---
 st.sidebar.header("Filtros")
 df_griegas_display = df_griegas # df_griegas es el cargado globalmente
+exp_key = 'all' # Clave de caché del vencimiento mostrado
 
 if df_griegas is not None and not df_griegas.empty and 'ExpirationDate' in df_griegas.columns:
     # Convertir ExpirationDate a datetime si no lo está ya (aunque el preproc debería hacerlo)
     if not pd.api.types.is_datetime64_any_dtype(df_griegas['ExpirationDate']):
-        df_griegas['ExpirationDate'] = pd.to_datetime(df_griegas['ExpirationDate'], errors='coerce')
+        # Se reasigna con assign en lugar de escribir la columna: el DataFrame de load_data no se modifica
+        df_griegas = df_griegas.assign(ExpirationDate=pd.to_datetime(df_griegas['ExpirationDate'], errors='coerce'))
+        df_griegas_display = df_griegas
 
     exp_dates = sorted(df_griegas['ExpirationDate'].dropna().unique())
 
@@ -76,9 +145,10 @@ if df_griegas is not None and not df_griegas.empty and 'ExpirationDate' in df_gr
                 index=len(formatted_exp_dates) - 1
             )
             selected_exp_date = pd.to_datetime(selected_exp_date_str)
-            df_griegas_display = df_griegas[df_griegas['ExpirationDate'] == selected_exp_date].copy()
+            df_griegas_display = df_griegas[df_griegas['ExpirationDate'] == selected_exp_date]
+            exp_key = str(selected_exp_date)
         elif exp_dates: # Solo una fecha de expiración
-            df_griegas_display = df_griegas.copy()
+            df_griegas_display = df_griegas
             # st.sidebar.info(f"Datos para vencimiento: {formatted_exp_dates[0]}") # Opcional: no mostrar si solo hay uno
         else: # No hay fechas de expiración válidas
              df_griegas_display = pd.DataFrame() # DataFrame vacío para evitar errores downstream
@@ -92,6 +162,115 @@ else:
     # st.sidebar.info("No hay datos de la cadena de opciones para filtrar por vencimiento.")
 
 
+# --- Sección Option Flow Inusual ---
+# Fragmento: los widgets de esta sección (premium mínimo, Side, Apertura/Cierre) solo vuelven a
+# ejecutar esta función, no el pipeline de Griegas.csv.
+@st.fragment
+def render_inusual_section(df_inusual, underlying_price, data_version):
+    st.header("Análisis de Option Flow Inusual")
+    if df_inusual is None:
+        st.error("No se pudieron cargar o procesar los datos de Inusual.csv. Por favor, verifique el archivo.")
+    elif df_inusual.empty:
+        st.info("No hay datos de operaciones inusuales para mostrar (Inusual.csv está vacío o no contiene datos).")
+    else:
+        st.subheader("Operaciones Inusuales Registradas")
+
+        flow_cols = st.columns(3)
+
+        min_premium_default = 0
+        if 'Premium' in df_inusual.columns and df_inusual['Premium'].count() > 0: # count ignora NaNs
+            quantile_val = df_inusual['Premium'].quantile(0.25)
+            if pd.notna(quantile_val):
+                min_premium_default = int(quantile_val)
+        min_premium = flow_cols[0].number_input("Premium Mínimo:", value=min_premium_default, step=10000, min_value=0, help="Filtrar operaciones por el premium total mínimo.")
+
+        available_sides = []
+        if 'Side' in df_inusual.columns:
+            available_sides = get_unique_sorted(data_version, 'Side', df_inusual['Side'])
+        selected_sides = flow_cols[1].multiselect("Filtrar por 'Side':", options=available_sides, default=available_sides, help="Seleccionar los 'Side' de las operaciones (ej. bid, ask, mid).")
+
+        available_oc = []
+        if 'OpenClose' in df_inusual.columns:
+            available_oc = get_unique_sorted(data_version, 'OpenClose', df_inusual['OpenClose'])
+        selected_oc = flow_cols[2].multiselect("Filtrar por Apertura/Cierre:", options=available_oc, default=available_oc, help="Filtrar por el tipo de apertura o cierre de la operación (ej. ToOpen, SellToOpen).")
+
+        # Construir condiciones de filtrado
+        mask = np.ones(len(df_inusual), dtype=bool) # Empezar con todos True
+        if 'Premium' in df_inusual.columns:
+            mask &= np.nan_to_num(df_inusual['Premium'].to_numpy(dtype=np.float64)) >= min_premium
+        if selected_sides and 'Side' in df_inusual.columns: # Solo filtrar si hay selecciones y la columna existe
+            mask &= category_isin_mask(df_inusual['Side'], selected_sides)
+        if selected_oc and 'OpenClose' in df_inusual.columns: # Solo filtrar si hay selecciones y la columna existe
+            mask &= category_isin_mask(df_inusual['OpenClose'], selected_oc)
+
+        df_inusual_filtered = df_inusual[mask]
+
+        cols_to_display_inusual = ['Symbol', 'Type', 'Strike', 'ExpirationDate', 'TradeTime', 'Side', 'OpenClose',
+                                   'Trade', 'Size', 'Premium', 'Volume', 'OpenInterest', 'IV', 'Delta', 'UnderlyingPrice']
+        display_df_inusual_table = df_inusual_filtered[[col for col in cols_to_display_inusual if col in df_inusual_filtered.columns]]
+
+        column_config_inusual = {
+            "Strike": st.column_config.NumberColumn(format="%.2f"),
+            "UnderlyingPrice": st.column_config.NumberColumn(format="$%.2f"),
+            "Trade": st.column_config.NumberColumn(format="$%.2f"),
+            "Size": st.column_config.NumberColumn(format="%d"),
+            "Premium": st.column_config.NumberColumn(format="$%d"),
+            "Volume": st.column_config.NumberColumn(format="%d"),
+            "OpenInterest": st.column_config.NumberColumn(format="%d"),
+            "IV": st.column_config.NumberColumn(format="%.2f%%"),
+            "Delta": st.column_config.NumberColumn(format="%.4f"),
+            "ExpirationDate": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        }
+        active_column_config_inusual = {k:v for k,v in column_config_inusual.items() if k in display_df_inusual_table.columns}
+
+        st.dataframe(display_df_inusual_table, height=300, use_container_width=True, column_config=active_column_config_inusual)
+
+        st.subheader("Visualización del Flujo Inusual")
+        if not df_inusual_filtered.empty:
+            try:
+                # Scattergl (WebGL) en lugar de SVG, y el tamaño agrupado en deciles de 'Size' para que
+                # solo viajen ~10 tamaños de marcador distintos
+                size_bins = pd.qcut(df_inusual_filtered['Size'], q=10, labels=False, duplicates='drop').fillna(0).to_numpy()
+                marker_sizes = 6 + 2 * size_bins
+                flow_hover = df_inusual_filtered.reindex(columns=['Symbol', 'ExpirationDate', 'Side', 'OpenClose', 'Size', 'Trade'])
+                flow_hover['ExpirationDate'] = pd.to_datetime(flow_hover['ExpirationDate'], errors='coerce').dt.strftime('%Y-%m-%d')
+                flow_hover = flow_hover.to_numpy(dtype=object)
+                flow_strikes = df_inusual_filtered['Strike'].to_numpy()
+                flow_premiums = df_inusual_filtered['Premium'].to_numpy()
+                is_call, is_put = type_masks(df_inusual_filtered)
+
+                fig_flow = go.Figure()
+                for option_type, color, type_mask in (('call', 'green', is_call), ('put', 'red', is_put)):
+                    if not type_mask.any():
+                        continue
+                    fig_flow.add_trace(go.Scattergl(
+                        x=flow_strikes[type_mask], y=flow_premiums[type_mask], mode='markers', name=option_type,
+                        marker=dict(size=marker_sizes[type_mask], color=color),
+                        customdata=flow_hover[type_mask],
+                        hovertemplate='<b>%{customdata[0]}</b><br>Strike: %{x}<br>Premium Total: $%{y:,.0f}<br>'
+                                      'Vencimiento: %{customdata[1]}<br>Side: %{customdata[2]}<br>Apertura/Cierre: %{customdata[3]}<br>'
+                                      'Nº Contratos: %{customdata[4]:,}<br>Trade: $%{customdata[5]:.2f}<extra></extra>'
+                    ))
+                fig_flow.update_layout(title='Flujo de Opciones Inusuales (Tamaño por Cantidad de Contratos)',
+                                       height=500, xaxis_title="Strike", yaxis_title="Premium Total ($)", yaxis_tickformat="$,.0f")
+                if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
+                    fig_flow.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente (Cadena)")
+                st.plotly_chart(fig_flow, use_container_width=True)
+
+                fig_flow_dist = px.histogram(df_inusual_filtered, x='Premium', color='Type',
+                                             marginal='box',
+                                             title='Distribución del Premium en Operaciones Inusuales',
+                                             labels={'Premium': 'Premium Total ($)'},
+                                             color_discrete_map={'call': 'green', 'put': 'red'},
+                                             hover_data={'Premium': ':$,.0f'}, height=400)
+                # El título del eje x ya sale de labels; solo falta el formato de los ticks
+                fig_flow_dist.update_layout(xaxis_tickformat="$,.0f")
+                st.plotly_chart(fig_flow_dist, use_container_width=True)
+            except Exception as e:
+                st.error(f"Error al generar gráficos de flujo inusual: {e}")
+        else:
+            st.info("No hay operaciones inusuales que coincidan con los filtros actuales para graficar.")
+
 # --- Título Principal ---
 st.title("📊 Dashboard Interactivo de Análisis de Opciones")
 st.markdown("Análisis basado en `Griegas.csv` y `Inusual.csv`.")
@@ -104,20 +283,22 @@ else:
     st.header("Métricas Clave del Mercado de Opciones")
 
     # Calcular métricas generales
-    underlying_price = df_griegas_display['UnderlyingPrice'].iloc[0] if not df_griegas_display.empty and 'UnderlyingPrice' in df_griegas_display.columns and pd.notna(df_griegas_display['UnderlyingPrice'].iloc[0]) else "N/A"
-    total_volume = df_griegas_display['Volume'].sum() if not df_griegas_display.empty and 'Volume' in df_griegas_display.columns else 0
-    total_oi = df_griegas_display['OpenInterest'].sum() if not df_griegas_display.empty and 'OpenInterest' in df_griegas_display.columns else 0
+    underlying_price = df_griegas_display['UnderlyingPrice'].iloc[0] if 'UnderlyingPrice' in df_griegas_display.columns else np.nan
+    if pd.isna(underlying_price):
+        underlying_price = "N/A"
+    # Volumen y OI totales en una sola reducción sobre el bloque contiguo (Volume y OpenInterest ya se validaron en load_data)
+    total_volume, total_oi = np.nansum(df_griegas_display[['Volume', 'OpenInterest']].to_numpy(dtype=np.float64), axis=0)
 
     # PC Ratios totales
-    pc_ratios_total_df = calculate_put_call_ratio(df_griegas_display, group_by_strike=False) if not df_griegas_display.empty else pd.DataFrame()
+    pc_ratios_strike_df, pc_ratios_total_df = get_put_call_ratios(exp_key, griegas_version, df_griegas_display)
     pc_volume_total = pc_ratios_total_df['PC_Volume_Ratio'].iloc[0] if not pc_ratios_total_df.empty else np.nan
     pc_oi_total = pc_ratios_total_df['PC_OI_Ratio'].iloc[0] if not pc_ratios_total_df.empty else np.nan
 
     # Max Pain
-    max_pain_strike = calculate_max_pain(df_griegas_display.copy().dropna(subset=['Strike', 'Type', 'OpenInterest']))
+    max_pain_strike = get_max_pain(exp_key, griegas_version, df_griegas_display)
 
     # Gamma Flip
-    gex_df, gamma_flip_point = calculate_gex(df_griegas_display.copy().dropna(subset=['Strike', 'Gamma', 'OpenInterest']))
+    money_at_risk_df, gex_df, gamma_flip_point, vega_exposure_df, theta_exposure_df = get_all_exposures(exp_key, griegas_version, df_griegas_display)
 
 
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -157,26 +338,22 @@ else:
                 if 'Type' not in df_griegas_display.columns or 'Volume' not in df_griegas_display.columns or 'OpenInterest' not in df_griegas_display.columns:
                     st.error("Columnas requeridas (Type, Volume, OpenInterest) no encontradas para el gráfico de Volumen/OI.")
                 else:
-                    strike_analysis = df_griegas_display.groupby('Strike').agg(
-                        CallVolume=('Volume', lambda x: x[df_griegas_display.loc[x.index, 'Type'] == 'call'].sum()),
-                        PutVolume=('Volume', lambda x: x[df_griegas_display.loc[x.index, 'Type'] == 'put'].sum()),
-                        CallOI=('OpenInterest', lambda x: x[df_griegas_display.loc[x.index, 'Type'] == 'call'].sum()),
-                        PutOI=('OpenInterest', lambda x: x[df_griegas_display.loc[x.index, 'Type'] == 'put'].sum())
-                    ).reset_index()
-
-                    if strike_analysis.empty:
+                    strike_aggs = get_strike_aggregates(exp_key, griegas_version, df_griegas_display)
+
+                    if strike_aggs is None or strike_aggs.call_volume is None or strike_aggs.strike.size == 0:
                         st.info("No hay datos agregados de Volumen/OI por strike para mostrar.")
                     else:
                         fig_oi_vol = make_subplots(rows=1, cols=2, subplot_titles=("Volumen por Strike", "Open Interest por Strike"))
 
-                    fig_oi_vol.add_trace(go.Bar(x=strike_analysis['Strike'], y=strike_analysis['CallVolume'], name='Call Volume', marker_color='green', hovertemplate='Strike: %{x}<br>Call Volume: %{y:,.0f}<extra></extra>'), row=1, col=1)
-                    fig_oi_vol.add_trace(go.Bar(x=strike_analysis['Strike'], y=strike_analysis['PutVolume'], name='Put Volume', marker_color='red', hovertemplate='Strike: %{x}<br>Put Volume: %{y:,.0f}<extra></extra>'), row=1, col=1)
+                        # Los arrays de StrikeAggs van directos a las trazas, sin DataFrame intermedio
+                        fig_oi_vol.add_trace(go.Bar(x=strike_aggs.strike, y=strike_aggs.call_volume, name='Call Volume', marker_color='green', hovertemplate='Strike: %{x}<br>Call Volume: %{y:,.0f}<extra></extra>'), row=1, col=1)
+                        fig_oi_vol.add_trace(go.Bar(x=strike_aggs.strike, y=strike_aggs.put_volume, name='Put Volume', marker_color='red', hovertemplate='Strike: %{x}<br>Put Volume: %{y:,.0f}<extra></extra>'), row=1, col=1)
 
-                    fig_oi_vol.add_trace(go.Bar(x=strike_analysis['Strike'], y=strike_analysis['CallOI'], name='Call OI', marker_color='lightgreen', opacity=0.7, hovertemplate='Strike: %{x}<br>Call OI: %{y:,.0f}<extra></extra>'), row=1, col=2)
-                    fig_oi_vol.add_trace(go.Bar(x=strike_analysis['Strike'], y=strike_analysis['PutOI'], name='Put OI', marker_color='salmon', opacity=0.7, hovertemplate='Strike: %{x}<br>Put OI: %{y:,.0f}<extra></extra>'), row=1, col=2)
+                        fig_oi_vol.add_trace(go.Bar(x=strike_aggs.strike, y=strike_aggs.call_oi, name='Call OI', marker_color='lightgreen', opacity=0.7, hovertemplate='Strike: %{x}<br>Call OI: %{y:,.0f}<extra></extra>'), row=1, col=2)
+                        fig_oi_vol.add_trace(go.Bar(x=strike_aggs.strike, y=strike_aggs.put_oi, name='Put OI', marker_color='salmon', opacity=0.7, hovertemplate='Strike: %{x}<br>Put OI: %{y:,.0f}<extra></extra>'), row=1, col=2)
 
-                    fig_oi_vol.update_layout(barmode='stack', height=400, template="plotly_dark", title_text="Volumen y Open Interest Agregado por Strike", xaxis_title="Strike")
-                    st.plotly_chart(fig_oi_vol, use_container_width=True)
+                        fig_oi_vol.update_layout(barmode='stack', height=400, title_text="Volumen y Open Interest Agregado por Strike", xaxis_title="Strike")
+                        st.plotly_chart(fig_oi_vol, use_container_width=True)
             except Exception as e:
                 st.error(f"Error al generar gráfico de Volumen/OI: {e}")
 
@@ -187,20 +364,21 @@ else:
                 if 'Type' not in df_griegas_display.columns or 'IV' not in df_griegas_display.columns:
                     st.error("Columnas 'Type' o 'IV' no encontradas para el gráfico de volatilidad.")
                 else:
-                    iv_calls = df_griegas_display[df_griegas_display['Type'] == 'call'].groupby('Strike', as_index=False)['IV'].mean()
-                    iv_puts = df_griegas_display[df_griegas_display['Type'] == 'put'].groupby('Strike', as_index=False)['IV'].mean()
+                    iv_by_type = get_iv_by_type(exp_key, griegas_version, df_griegas_display)
+                    iv_calls = iv_by_type['call'].dropna()
+                    iv_puts = iv_by_type['put'].dropna()
 
                     fig_iv = go.Figure()
                     if not iv_calls.empty:
-                        fig_iv.add_trace(go.Scatter(x=iv_calls['Strike'], y=iv_calls['IV'], mode='lines+markers', name='IV Calls', line=dict(color='green'), hovertemplate='Strike: %{x}<br>IV Call: %{y:.2%}<extra></extra>'))
+                        fig_iv.add_trace(go.Scatter(x=iv_calls.index.to_numpy(), y=iv_calls.to_numpy(), mode='lines+markers', name='IV Calls', line=dict(color='green'), hovertemplate='Strike: %{x}<br>IV Call: %{y:.2%}<extra></extra>'))
                     if not iv_puts.empty:
-                        fig_iv.add_trace(go.Scatter(x=iv_puts['Strike'], y=iv_puts['IV'], mode='lines+markers', name='IV Puts', line=dict(color='red'), hovertemplate='Strike: %{x}<br>IV Put: %{y:.2%}<extra></extra>'))
+                        fig_iv.add_trace(go.Scatter(x=iv_puts.index.to_numpy(), y=iv_puts.to_numpy(), mode='lines+markers', name='IV Puts', line=dict(color='red'), hovertemplate='Strike: %{x}<br>IV Put: %{y:.2%}<extra></extra>'))
 
                     if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
                          fig_iv.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente")
 
                     fig_iv.update_layout(title='Volatilidad Implícita Promedio por Strike', xaxis_title='Strike', yaxis_title='Volatilidad Implícita',
-                                         height=400, template="plotly_dark", yaxis_tickformat=".2%")
+                                         height=400, yaxis_tickformat=".2%")
                     if not iv_calls.empty or not iv_puts.empty:
                         st.plotly_chart(fig_iv, use_container_width=True)
                     else:
@@ -242,12 +420,12 @@ else:
         with tab4:
             st.subheader("Put/Call Ratios por Strike")
             try:
-                pc_ratios_strike_df = calculate_put_call_ratio(df_griegas_display, group_by_strike=True)
                 if not pc_ratios_strike_df.empty:
                     fig_pc_strike = make_subplots(rows=1, cols=2, subplot_titles=("P/C Ratio Volumen", "P/C Ratio Open Interest"))
-                    fig_pc_strike.add_trace(go.Bar(x=pc_ratios_strike_df['Strike'], y=pc_ratios_strike_df['PC_Volume_Ratio'], name='P/C Vol Ratio', hovertemplate='Strike: %{x}<br>P/C Vol: %{y:.2f}<extra></extra>'), row=1, col=1)
-                    fig_pc_strike.add_trace(go.Bar(x=pc_ratios_strike_df['Strike'], y=pc_ratios_strike_df['PC_OI_Ratio'], name='P/C OI Ratio', hovertemplate='Strike: %{x}<br>P/C OI: %{y:.2f}<extra></extra>'), row=1, col=2)
-                    fig_pc_strike.update_layout(height=400, template="plotly_dark", showlegend=False, xaxis_title="Strike")
+                    pc_strikes = pc_ratios_strike_df['Strike'].to_numpy()
+                    fig_pc_strike.add_trace(go.Bar(x=pc_strikes, y=pc_ratios_strike_df['PC_Volume_Ratio'].to_numpy(), name='P/C Vol Ratio', hovertemplate='Strike: %{x}<br>P/C Vol: %{y:.2f}<extra></extra>'), row=1, col=1)
+                    fig_pc_strike.add_trace(go.Bar(x=pc_strikes, y=pc_ratios_strike_df['PC_OI_Ratio'].to_numpy(), name='P/C OI Ratio', hovertemplate='Strike: %{x}<br>P/C OI: %{y:.2f}<extra></extra>'), row=1, col=2)
+                    fig_pc_strike.update_layout(height=400, showlegend=False, xaxis_title="Strike")
                     st.plotly_chart(fig_pc_strike, use_container_width=True)
                     st.dataframe(pc_ratios_strike_df, use_container_width=True, column_config={"Strike": st.column_config.NumberColumn(format="%.2f")})
                 else:
@@ -268,12 +446,11 @@ else:
         with risk_tab1:
             st.subheader("Dinero en Riesgo (Money at Risk) por Strike")
             try:
-                money_at_risk_df = calculate_money_at_risk(df_griegas_display.copy())
                 if not money_at_risk_df.empty:
                     fig_mar = px.bar(money_at_risk_df, x='Strike', y='MoneyAtRisk', title='Dinero en Riesgo por Strike',
                                      labels={'MoneyAtRisk': 'Dinero en Riesgo ($)'}) # hovertemplate eliminado de aquí
                     fig_mar.update_traces(hovertemplate='Strike: %{x}<br>Dinero en Riesgo: $%{y:,.0f}<extra></extra>') # hovertemplate movido aquí
-                    fig_mar.update_layout(height=400, template="plotly_dark", yaxis_tickformat="$,.0f", xaxis_title="Strike")
+                    fig_mar.update_layout(height=400, yaxis_tickformat="$,.0f", xaxis_title="Strike")
                     if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
                         fig_mar.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente")
                     st.plotly_chart(fig_mar, use_container_width=True)
@@ -290,15 +467,16 @@ else:
             try:
                 if not gex_df.empty: # gex_df y gamma_flip_point se calculan arriba en KPIs
                     fig_gex = make_subplots(specs=[[{"secondary_y": True}]])
-                    fig_gex.add_trace(go.Bar(x=gex_df['Strike'], y=gex_df['DealerGEX'], name='Dealer GEX por Strike', marker_color='purple', hovertemplate='Strike: %{x}<br>Dealer GEX: %{y:,.0f}<extra></extra>'), secondary_y=False)
-                    fig_gex.add_trace(go.Scatter(x=gex_df['Strike'], y=gex_df['CumulativeDealerGEX'], name='GEX Acumulado', mode='lines', line=dict(color='orange'), hovertemplate='Strike: %{x}<br>GEX Acumulado: %{y:,.0f}<extra></extra>'), secondary_y=True)
+                    gex_strikes = gex_df['Strike'].to_numpy()
+                    fig_gex.add_trace(go.Bar(x=gex_strikes, y=gex_df['DealerGEX'].to_numpy(), name='Dealer GEX por Strike', marker_color='purple', hovertemplate='Strike: %{x}<br>Dealer GEX: %{y:,.0f}<extra></extra>'), secondary_y=False)
+                    fig_gex.add_trace(go.Scatter(x=gex_strikes, y=gex_df['CumulativeDealerGEX'].to_numpy(), name='GEX Acumulado', mode='lines', line=dict(color='orange'), hovertemplate='Strike: %{x}<br>GEX Acumulado: %{y:,.0f}<extra></extra>'), secondary_y=True)
 
                     if gamma_flip_point is not None and isinstance(gamma_flip_point, (int,float)):
                          fig_gex.add_vline(x=gamma_flip_point, line_width=2, line_dash="dash", line_color="cyan", annotation_text=f"Gamma Flip: {gamma_flip_point:,.2f}")
                     if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
                         fig_gex.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente")
 
-                    fig_gex.update_layout(title='Exposición a Gamma del Dealer (GEX)', height=500, template="plotly_dark", xaxis_title="Strike")
+                    fig_gex.update_layout(title='Exposición a Gamma del Dealer (GEX)', height=500, xaxis_title="Strike")
                     fig_gex.update_yaxes(title_text="Dealer GEX por Strike", secondary_y=False, tickformat=",.0f")
                     fig_gex.update_yaxes(title_text="GEX Acumulado del Dealer", secondary_y=True, tickformat=",.0f")
                     st.plotly_chart(fig_gex, use_container_width=True)
@@ -316,13 +494,12 @@ else:
         with risk_tab3:
             st.subheader("Exposición a Vega (Dealer)")
             try:
-                vega_exposure_df = calculate_vega_exposure(df_griegas_display.copy().dropna(subset=['Strike', 'Vega', 'OpenInterest']))
                 if not vega_exposure_df.empty:
                     fig_vega = px.bar(vega_exposure_df, x='Strike', y='DealerVegaExposure', title='Exposición a Vega del Dealer por Strike',
                                       labels={'DealerVegaExposure': 'Exposición a Vega ($ por 1% cambio IV)'}, color='DealerVegaExposure',
                                       color_continuous_scale=px.colors.diverging.Picnic) # hovertemplate eliminado de aquí
                     fig_vega.update_traces(hovertemplate='Strike: %{x}<br>Exposición Vega: $%{y:,.0f}<extra></extra>') # hovertemplate movido aquí
-                    fig_vega.update_layout(height=400, template="plotly_dark", yaxis_tickformat="$,.0f", xaxis_title="Strike")
+                    fig_vega.update_layout(height=400, yaxis_tickformat="$,.0f", xaxis_title="Strike")
                     if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
                         fig_vega.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente")
                     st.plotly_chart(fig_vega, use_container_width=True)
@@ -337,13 +514,12 @@ else:
         with risk_tab4:
             st.subheader("Exposición a Theta (Dealer)")
             try:
-                theta_exposure_df = calculate_theta_exposure(df_griegas_display.copy().dropna(subset=['Strike', 'Theta', 'OpenInterest']))
                 if not theta_exposure_df.empty:
                     fig_theta = px.bar(theta_exposure_df, x='Strike', y='DealerThetaExposure', title='Exposición a Theta del Dealer por Strike',
                                        labels={'DealerThetaExposure': 'Exposición a Theta ($ por día)'}, color='DealerThetaExposure',
                                        color_continuous_scale=px.colors.diverging.Geyser) # hovertemplate eliminado de aquí
                     fig_theta.update_traces(hovertemplate='Strike: %{x}<br>Exposición Theta: $%{y:,.0f}<extra></extra>') # hovertemplate movido aquí
-                    fig_theta.update_layout(height=400, template="plotly_dark", yaxis_tickformat="$,.0f", xaxis_title="Strike")
+                    fig_theta.update_layout(height=400, yaxis_tickformat="$,.0f", xaxis_title="Strike")
                     if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
                         fig_theta.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente")
                     st.plotly_chart(fig_theta, use_container_width=True)
@@ -357,100 +533,7 @@ else:
 
     st.markdown("---")
     # --- Sección 3: Option Flow Inusual ---
-    st.header("Análisis de Option Flow Inusual")
-    if df_inusual is None:
-        st.error("No se pudieron cargar o procesar los datos de Inusual.csv. Por favor, verifique el archivo.")
-    elif df_inusual.empty:
-        st.info("No hay datos de operaciones inusuales para mostrar (Inusual.csv está vacío o no contiene datos).")
-    else:
-        st.subheader("Operaciones Inusuales Registradas")
-
-        flow_cols = st.columns(3)
-
-        min_premium_default = 0
-        if 'Premium' in df_inusual.columns and df_inusual['Premium'].count() > 0: # count ignora NaNs
-            quantile_val = df_inusual['Premium'].quantile(0.25)
-            if pd.notna(quantile_val):
-                min_premium_default = int(quantile_val)
-        min_premium = flow_cols[0].number_input("Premium Mínimo:", value=min_premium_default, step=10000, min_value=0, help="Filtrar operaciones por el premium total mínimo.")
-
-        available_sides = []
-        if 'Side' in df_inusual.columns:
-            available_sides = sorted(df_inusual['Side'].dropna().unique().tolist())
-        selected_sides = flow_cols[1].multiselect("Filtrar por 'Side':", options=available_sides, default=available_sides, help="Seleccionar los 'Side' de las operaciones (ej. bid, ask, mid).")
-
-        available_oc = []
-        if 'OpenClose' in df_inusual.columns:
-            available_oc = sorted(df_inusual['OpenClose'].dropna().unique().tolist())
-        selected_oc = flow_cols[2].multiselect("Filtrar por Apertura/Cierre:", options=available_oc, default=available_oc, help="Filtrar por el tipo de apertura o cierre de la operación (ej. ToOpen, SellToOpen).")
-
-        # Construir condiciones de filtrado
-        conditions = pd.Series([True] * len(df_inusual)) # Empezar con todos True
-        if 'Premium' in df_inusual.columns:
-            conditions &= (df_inusual['Premium'].fillna(0) >= min_premium)
-        if selected_sides and 'Side' in df_inusual.columns: # Solo filtrar si hay selecciones y la columna existe
-            conditions &= df_inusual['Side'].isin(selected_sides)
-        if selected_oc and 'OpenClose' in df_inusual.columns: # Solo filtrar si hay selecciones y la columna existe
-            conditions &= df_inusual['OpenClose'].isin(selected_oc)
-
-        df_inusual_filtered = df_inusual[conditions]
-
-        cols_to_display_inusual = ['Symbol', 'Type', 'Strike', 'ExpirationDate', 'TradeTime', 'Side', 'OpenClose',
-                                   'Trade', 'Size', 'Premium', 'Volume', 'OpenInterest', 'IV', 'Delta', 'UnderlyingPrice']
-        display_df_inusual_table = df_inusual_filtered[[col for col in cols_to_display_inusual if col in df_inusual_filtered.columns]]
-
-        column_config_inusual = {
-            "Strike": st.column_config.NumberColumn(format="%.2f"),
-            "UnderlyingPrice": st.column_config.NumberColumn(format="$%.2f"),
-            "Trade": st.column_config.NumberColumn(format="$%.2f"),
-            "Size": st.column_config.NumberColumn(format="%d"),
-            "Premium": st.column_config.NumberColumn(format="$%d"),
-            "Volume": st.column_config.NumberColumn(format="%d"),
-            "OpenInterest": st.column_config.NumberColumn(format="%d"),
-            "IV": st.column_config.NumberColumn(format="%.2f%%"),
-            "Delta": st.column_config.NumberColumn(format="%.4f"),
-            "ExpirationDate": st.column_config.DateColumn(format="YYYY-MM-DD"),
-        }
-        active_column_config_inusual = {k:v for k,v in column_config_inusual.items() if k in display_df_inusual_table.columns}
-
-        st.dataframe(display_df_inusual_table, height=300, use_container_width=True, column_config=active_column_config_inusual)
-
-        st.subheader("Visualización del Flujo Inusual")
-        if not df_inusual_filtered.empty:
-            try:
-                fig_flow = px.scatter(df_inusual_filtered, x='Strike', y='Premium',
-                                      size='Size', color='Type', hover_name='Symbol',
-                                      hover_data={ # Personalizar hover data y su formato si es necesario
-                                          'ExpirationDate': True, # Mostrar fecha
-                                          'Trade': ':.2f', # Formato para Trade Price
-                                          'Side': True,
-                                          'OpenClose': True,
-                                          'Volume': ':,', # Formato para Volume
-                                          'OpenInterest': ':,', # Formato para OI
-                                          'IV': ':.2%', # Formato para IV
-                                          'UnderlyingPrice': ':.2f',
-                                          'Premium': ':$,.0f' # Formato para Premium
-                                      },
-                                      title='Flujo de Opciones Inusuales (Tamaño por Cantidad de Contratos)',
-                                      labels={'Premium': 'Premium Total ($)', 'Size': 'Nº Contratos'},
-                                      color_discrete_map={'call': 'green', 'put': 'red'})
-                fig_flow.update_layout(height=500, template="plotly_dark", xaxis_title="Strike", yaxis_title="Premium Total ($)", yaxis_tickformat="$,.0f")
-                if underlying_price != "N/A" and isinstance(underlying_price, (int, float)):
-                    fig_flow.add_vline(x=underlying_price, line_width=2, line_dash="dash", line_color="grey", annotation_text="Precio Subyacente (Cadena)")
-                st.plotly_chart(fig_flow, use_container_width=True)
-
-                fig_flow_dist = px.histogram(df_inusual_filtered, x='Premium', color='Type',
-                                             marginal='box',
-                                             title='Distribución del Premium en Operaciones Inusuales',
-                                             labels={'Premium': 'Premium Total ($)'},
-                                             color_discrete_map={'call': 'green', 'put': 'red'},
-                                             hover_data={'Premium': ':$,.0f'})
-                fig_flow_dist.update_layout(height=400, template="plotly_dark", xaxis_title="Premium Total ($)", xaxis_tickformat="$,.0f")
-                st.plotly_chart(fig_flow_dist, use_container_width=True)
-            except Exception as e:
-                st.error(f"Error al generar gráficos de flujo inusual: {e}")
-        else:
-            st.info("No hay operaciones inusuales que coincidan con los filtros actuales para graficar.")
+    render_inusual_section(df_inusual, underlying_price, inusual_version)
 
 # --- Footer o información adicional (opcional) ---
 st.sidebar.markdown("---")
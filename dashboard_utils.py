@@ -1,24 +1,205 @@
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+try:
+    from numba import njit
+except ImportError: # Numba es opcional: sin él las sumas por strike usan np.bincount (ver _sum_by_group)
+    njit = None
+
+# Type como categórica de dos valores: los códigos enteros (call=0, put=1) sustituyen a las comparaciones de strings
+TYPE_DTYPE = pd.CategoricalDtype(categories=['call', 'put'])
+
+# Precisión reducida para griegas y precios: solo se agregan y grafican, float32 basta y reduce a la mitad
+# los bytes recorridos. Strike, UnderlyingPrice, Volume y OpenInterest se mantienen en float64: Strike es la
+# clave de agrupación (y se muestra en los hover), y los totales de OI superan el rango entero exacto de float32.
+GRIEGAS_DTYPES = {'Bid': 'float32', 'Ask': 'float32', 'MidPrice': 'float32', 'IV': 'float32',
+                  'ITMProbability': 'float32', 'Delta': 'float32', 'Gamma': 'float32',
+                  'Theta': 'float32', 'Vega': 'float32'}
+# En Inusual igual: precio de la operación, IV y Delta en float32; Premium, Size, Volume y OpenInterest
+# quedan en float64 porque se suman y los totales de Premium superan la precisión entera de float32.
+INUSUAL_DTYPES = {'Trade': 'float32', 'IV': 'float32', 'Delta': 'float32'}
+
+# Columnas del CSV original que usa el dashboard; el resto no se parsea (proyección en la lectura)
+GRIEGAS_USECOLS = {'Symbol', 'Price~', 'Type', 'Strike', 'Exp Date', 'Bid', 'Ask', 'Volume', 'Open Int',
+                   'IV', 'Delta', 'Gamma', 'Theta', 'Vega', 'ITM Prob', 'Time'}
+INUSUAL_USECOLS = {'Symbol', 'Price~', 'Type', 'Strike', 'Expires', 'DTE', 'Trade', 'Size', 'Side', 'Premium',
+                   'Volume', 'Open Int', 'IV', 'Delta', '*', 'Time'}
+
+# Columnas de texto repetitivo que PyArrow entrega ya como categóricas desde el parser
+# (Side y OpenClose ('*') quedan listas para que los filtros comparen códigos enteros)
+GRIEGAS_READ_DTYPES = {'Type': 'category'}
+INUSUAL_READ_DTYPES = {'Type': 'category', 'Side': 'category', '*': 'category'}
+
+# Renombrado de columnas del CSV y columnas numéricas/de porcentaje (ya renombradas) de cada loader;
+# constantes de módulo para no reconstruirlas en cada carga
+GRIEGAS_RENAME = {'Price~': 'UnderlyingPrice', 'Exp Date': 'ExpirationDate', 'Open Int': 'OpenInterest',
+                  'ITM Prob': 'ITMProbability'}
+GRIEGAS_NUMERIC_COLS = ('UnderlyingPrice', 'Strike', 'Bid', 'Ask', 'Volume', 'OpenInterest', 'Delta', 'Gamma', 'Theta', 'Vega')
+GRIEGAS_PERCENTAGE_COLS = ('IV', 'ITMProbability')
+INUSUAL_RENAME = {'Price~': 'UnderlyingPrice', 'Open Int': 'OpenInterest', 'Expires': 'ExpirationDateTime', '*': 'OpenClose'}
+INUSUAL_NUMERIC_COLS = ('UnderlyingPrice', 'Strike', 'Trade', 'Size', 'Premium', 'Volume', 'OpenInterest', 'Delta')
+INUSUAL_PERCENTAGE_COLS = ('IV',)
+
+def _csv_names(columns, rename):
+    """Traduce nombres ya renombrados a los del CSV original."""
+    original = {new: old for old, new in rename.items()}
+    return {original.get(col, col) for col in columns}
+
+# Columnas (nombres del CSV) que se limpian dentro de Arrow antes de pasar a pandas:
+# las numéricas pierden las comas de miles y las de porcentaje el '%' (la división entre 100 la hace clean_percentage_column)
+GRIEGAS_CSV_NUMERIC = _csv_names(GRIEGAS_NUMERIC_COLS, GRIEGAS_RENAME)
+GRIEGAS_CSV_PERCENT = _csv_names(GRIEGAS_PERCENTAGE_COLS, GRIEGAS_RENAME)
+INUSUAL_CSV_NUMERIC = _csv_names(INUSUAL_NUMERIC_COLS, INUSUAL_RENAME) | {'DTE'}
+INUSUAL_CSV_PERCENT = _csv_names(INUSUAL_PERCENTAGE_COLS, INUSUAL_RENAME)
+
+# Directorio (junto a cada CSV) donde se guarda el DataFrame ya preprocesado en Parquet
+CACHE_DIR = '.cache'
+# Versión del formato de la caché: subirla cuando cambie el preprocesamiento invalida las cachés existentes
+CACHE_FORMAT_VERSION = '1'
+# Clave de los metadatos Parquet con la versión y el mtime/tamaño del CSV del que salió la caché
+CACHE_METADATA_KEY = b'opciones.cache'
+
+# Valores que el CSV usa para "sin dato"; 'unch' aparece en columnas numéricas
+CSV_NULL_VALUES = pa_csv.ConvertOptions().null_values + ['unch']
+
+# Formatos de fecha de los CSV ('Exp Date' ISO, 'Expires' como 06/21/24 16:00 y 'Time' de Griegas como 06/14/24):
+# Arrow los prueba en C++ al inferir cada columna; una columna que no encaje queda como texto para pd.to_datetime
+CSV_TIMESTAMP_PARSERS = [pa_csv.ISO8601, '%m/%d/%y %H:%M', '%m/%d/%y', '%m/%d/%Y %H:%M', '%m/%d/%Y']
 
 def clean_numeric_column(series):
     """Limpia una columna numérica eliminando comas y convirtiendo a float."""
-    if series.dtype == 'object':
+    # Las columnas que el parser ya entregó como numéricas no pasan por el camino de strings.
+    # 'unch', 'N/A' y '' no necesitan reemplazo previo: to_numeric(errors='coerce') los deja como NaN.
+    if pd.api.types.is_string_dtype(series.dtype):
         series = series.str.replace(',', '', regex=False)
-        series = series.replace(['unch', 'N/A', ''], np.nan, regex=False)
     return pd.to_numeric(series, errors='coerce')
 
 def clean_percentage_column(series):
     """Limpia una columna de porcentaje eliminando '%' y convirtiendo a float."""
-    if series.dtype == 'object':
+    if pd.api.types.is_string_dtype(series.dtype):
         series = series.str.rstrip('%')
-        series = series.replace(['unch', 'N/A', ''], np.nan, regex=False)
     return pd.to_numeric(series, errors='coerce') / 100.0
 
-def load_and_preprocess_griegas(filepath='Griegas.csv'):
-    """Carga y preprocesa el archivo Griegas.csv."""
+def read_csv_columns(filepath, usecols, dtype=None, numeric_cols=(), percentage_cols=()):
+    """Lee con el parser multihilo de PyArrow solo las columnas de usecols presentes en el CSV.
+
+    Las columnas de numeric_cols/percentage_cols que llegan como texto se limpian y convierten a float64
+    con los kernels de Arrow; si alguna tiene valores no numéricos se deja como texto para clean_*_column.
+    """
+    header = pd.read_csv(filepath, nrows=0).columns
+    present = [col for col in header if col in usecols]
+    column_types = {col: pa.dictionary(pa.int32(), pa.string())
+                    for col, t in (dtype or {}).items() if t == 'category' and col in present}
+    # Solo se descartan las filas de una sola celda, como el pie "Downloaded from Barchart.com as of ...";
+    # cualquier otra fila mal formada hace fallar la lectura (el loader informa del error)
+    skipped_rows = []
+    def skip_footer(row):
+        if row.actual_columns == 1:
+            skipped_rows.append(row.text)
+            return 'skip'
+        return 'error'
+    table = pa_csv.read_csv(
+        filepath,
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_footer),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=present, column_types=column_types, null_values=CSV_NULL_VALUES, strings_can_be_null=True,
+            timestamp_parsers=CSV_TIMESTAMP_PARSERS))
+    unexpected_rows = [text for text in skipped_rows if not text.strip('"').startswith('Downloaded from Barchart')]
+    if unexpected_rows:
+        print(f"Aviso: se omitieron {len(unexpected_rows)} filas de una sola columna en {filepath}: {unexpected_rows[:3]}")
+
+    for col in present:
+        is_numeric, is_percentage = col in numeric_cols, col in percentage_cols
+        column = table[col]
+        if not (is_numeric or is_percentage) or not pa.types.is_string(column.type):
+            continue
+        cleaned = pc.replace_substring(column, ',', '') if is_numeric else pc.utf8_rtrim(column, characters='%')
+        try:
+            cleaned = pc.cast(cleaned, pa.float64())
+        except pa.ArrowInvalid:
+            continue
+        table = table.set_column(table.schema.get_field_index(col), col, cleaned)
+    # Fechas como datetime64[ns] (no objetos date de Python) para que pd.to_datetime no tenga que reparsearlas
+    return table.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
+
+def normalize_option_type(series):
+    """Convierte Type a TYPE_DTYPE pasando a minúsculas solo las categorías, no cada fila."""
+    type_col = series.astype('category')
+    new_codes = TYPE_DTYPE.categories.get_indexer(type_col.cat.categories.astype(str).str.lower())
+    # El -1 añadido al final hace que los códigos NaN (-1) sigan siendo NaN
+    codes = np.append(new_codes, -1)[type_col.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=TYPE_DTYPE),
+                     index=series.index, name=series.name)
+
+def _cache_signature(filepath):
+    """Identifica el CSV de origen y el formato de la caché: versión, mtime (ns) y tamaño."""
+    stat = os.stat(filepath)
+    return f'{CACHE_FORMAT_VERSION}:{stat.st_mtime_ns}:{stat.st_size}'.encode()
+
+def load_with_parquet_cache(filepath, preprocess_fn):
+    """Devuelve preprocess_fn(filepath) desde '.cache/<nombre>.parquet' si se generó de este mismo CSV; si no, lo regenera.
+
+    La caché guarda en sus metadatos la firma del CSV (ver _cache_signature) y solo se usa si coincide exactamente,
+    así que un CSV reemplazado por otro con un mtime anterior (copias que conservan la fecha) también la invalida.
+    """
+    cache_path = os.path.join(os.path.dirname(filepath), CACHE_DIR, os.path.splitext(os.path.basename(filepath))[0] + '.parquet')
+    try:
+        signature = _cache_signature(filepath)
+    except OSError: # Sin CSV: el preprocesamiento informa del error
+        return preprocess_fn(filepath)
+
+    try:
+        # El with cierra el archivo antes de regenerarlo: en Windows os.replace falla sobre un archivo abierto
+        with pq.ParquetFile(cache_path) as cache_file:
+            if (cache_file.schema_arrow.metadata or {}).get(CACHE_METADATA_KEY) == signature:
+                return cache_file.read().to_pandas()
+    except OSError: # Sin caché todavía: se pasa por el preprocesamiento
+        pass
+    except Exception as e:
+        print(f"Error al leer la caché {cache_path}, se regenera desde el CSV: {e}")
+
+    df = preprocess_fn(filepath)
+    if df is not None:
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), CACHE_METADATA_KEY: signature})
+            # Se escribe en un temporal y se renombra: otro proceso nunca lee una caché a medio escribir
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.parquet.tmp')
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression='snappy')
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"No se pudo escribir la caché {cache_path}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return df
+
+def load_and_preprocess_griegas(filepath='Griegas.csv', use_cache=True):
+    """Carga y preprocesa el archivo Griegas.csv (desde la caché Parquet si está al día)."""
+    if use_cache:
+        return load_with_parquet_cache(filepath, preprocess_griegas)
+    return preprocess_griegas(filepath)
+
+def load_and_preprocess_inusual(filepath='Inusual.csv', use_cache=True):
+    """Carga y preprocesa el archivo Inusual.csv (desde la caché Parquet si está al día)."""
+    if use_cache:
+        return load_with_parquet_cache(filepath, preprocess_inusual)
+    return preprocess_inusual(filepath)
+
+def preprocess_griegas(filepath):
+    """Lee y limpia Griegas.csv sin pasar por la caché."""
     try:
-        df = pd.read_csv(filepath)
+        df = read_csv_columns(filepath, GRIEGAS_USECOLS, GRIEGAS_READ_DTYPES, GRIEGAS_CSV_NUMERIC, GRIEGAS_CSV_PERCENT)
     except FileNotFoundError:
         print(f"Error: El archivo {filepath} no fue encontrado.")
         return None
@@ -27,32 +208,24 @@ def load_and_preprocess_griegas(filepath='Griegas.csv'):
         return None
 
     # Renombrar columnas para consistencia y facilidad de uso
-    df.rename(columns={
-        'Price~': 'UnderlyingPrice',
-        'Exp Date': 'ExpirationDate',
-        'Open Int': 'OpenInterest',
-        'ITM Prob': 'ITMProbability'
-    }, inplace=True)
+    df.rename(columns=GRIEGAS_RENAME, inplace=True)
 
     # Limpieza de columnas numéricas y de porcentaje
-    numeric_cols = ['UnderlyingPrice', 'Strike', 'Bid', 'Ask', 'Volume', 'OpenInterest',
-                    'Delta', 'Gamma', 'Theta', 'Vega']
-    for col in numeric_cols:
+    for col in GRIEGAS_NUMERIC_COLS:
         if col in df.columns:
             df[col] = clean_numeric_column(df[col])
 
-    percentage_cols = ['IV', 'ITMProbability']
-    for col in percentage_cols:
+    for col in GRIEGAS_PERCENTAGE_COLS:
         if col in df.columns:
             df[col] = clean_percentage_column(df[col])
             if col == 'IV': # IV suele mostrarse como % pero se usa como decimal en cálculos
                  pass # ya está dividido por 100
 
-    # Convertir fechas
+    # Convertir fechas (ya llegan como datetime64 desde Arrow; format='mixed' solo actúa si alguna quedó como texto)
     if 'ExpirationDate' in df.columns:
-        df['ExpirationDate'] = pd.to_datetime(df['ExpirationDate'], errors='coerce')
+        df['ExpirationDate'] = pd.to_datetime(df['ExpirationDate'], format='mixed', errors='coerce')
     if 'Time' in df.columns: # 'Time' en Griegas.csv parece ser la fecha de última operación
-        df['LastTradeDate'] = pd.to_datetime(df['Time'], errors='coerce')
+        df['LastTradeDate'] = pd.to_datetime(df['Time'], format='mixed', errors='coerce')
         # df.drop(columns=['Time'], inplace=True)
 
 
@@ -62,16 +235,18 @@ def load_and_preprocess_griegas(filepath='Griegas.csv'):
     else:
         df['MidPrice'] = np.nan
 
-    # Asegurar que Type (Call/Put) sea consistente (ej. minúsculas)
+    # Asegurar que Type (Call/Put) sea consistente (ej. minúsculas) y guardarla como categórica
     if 'Type' in df.columns:
-        df['Type'] = df['Type'].str.lower()
+        df['Type'] = normalize_option_type(df['Type'])
+
+    df = df.astype({col: dtype for col, dtype in GRIEGAS_DTYPES.items() if col in df.columns})
 
     return df
 
-def load_and_preprocess_inusual(filepath='Inusual.csv'):
-    """Carga y preprocesa el archivo Inusual.csv."""
+def preprocess_inusual(filepath):
+    """Lee y limpia Inusual.csv sin pasar por la caché."""
     try:
-        df = pd.read_csv(filepath)
+        df = read_csv_columns(filepath, INUSUAL_USECOLS, INUSUAL_READ_DTYPES, INUSUAL_CSV_NUMERIC, INUSUAL_CSV_PERCENT)
     except FileNotFoundError:
         print(f"Error: El archivo {filepath} no fue encontrado.")
         return None
@@ -79,39 +254,35 @@ def load_and_preprocess_inusual(filepath='Inusual.csv'):
         print(f"Error al leer el archivo {filepath}: {e}")
         return None
 
-    df.rename(columns={
-        'Price~': 'UnderlyingPrice',
-        'Open Int': 'OpenInterest',
-        'Expires': 'ExpirationDateTime',
-        '*': 'OpenClose'
-    }, inplace=True)
+    df.rename(columns=INUSUAL_RENAME, inplace=True)
 
-    numeric_cols = ['UnderlyingPrice', 'Strike', 'Trade', 'Size', 'Premium', 'Volume', 'OpenInterest', 'Delta']
-    for col in numeric_cols:
+    for col in INUSUAL_NUMERIC_COLS:
         if col in df.columns:
             df[col] = clean_numeric_column(df[col])
 
-    percentage_cols = ['IV']
-    for col in percentage_cols:
+    for col in INUSUAL_PERCENTAGE_COLS:
         if col in df.columns:
             df[col] = clean_percentage_column(df[col])
 
     if 'ExpirationDateTime' in df.columns:
-        df['ExpirationDate'] = pd.to_datetime(df['ExpirationDateTime'], errors='coerce').dt.date
-        df['ExpirationDate'] = pd.to_datetime(df['ExpirationDate'], errors='coerce')
-
+        # Fecha de vencimiento sin la hora: normalize() trunca en datetime64 sin pasar por objetos date
+        df['ExpirationDateTime'] = pd.to_datetime(df['ExpirationDateTime'], format='mixed', errors='coerce')
+        df['ExpirationDate'] = df['ExpirationDateTime'].dt.normalize()
 
     if 'Time' in df.columns: # 'Time' en Inusual.csv es la hora de la operación
-        df['TradeTime'] = df['Time'] # Mantenerla como string por ahora o parsear si es necesario
+        df['TradeTime'] = df['Time'] # Arrow ya la entrega parseada como hora (HH:MM:SS) al leer el CSV
         # df.drop(columns=['Time'], inplace=True)
 
+    # Misma Type categórica (call/put) que en Griegas
     if 'Type' in df.columns:
-        df['Type'] = df['Type'].str.lower()
+        df['Type'] = normalize_option_type(df['Type'])
 
     # Limpiar DTE y convertir a numérico si existe
     if 'DTE' in df.columns:
         df['DTE'] = clean_numeric_column(df['DTE'])
 
+    df = df.astype({col: dtype for col, dtype in INUSUAL_DTYPES.items() if col in df.columns})
+
     return df
 
 if __name__ == '__main__':
@@ -142,104 +313,263 @@ if __name__ == '__main__':
     # ... (similar a las otras, con su limpieza específica)
     # pass
 
+def factorize_strikes(strike_series):
+    """Devuelve (códigos, strikes ordenados) de la columna Strike; los NaN tienen código -1.
+
+    Con un único strike (p. ej. una vista filtrada a un solo nivel) evita el hash de pd.factorize
+    con una sola comparación vectorizada.
+    """
+    values = strike_series.to_numpy()
+    if values.size and (values == values[0]).all():
+        return np.zeros(values.size, dtype=np.intp), values[:1].copy()
+    strike_codes, strikes = pd.factorize(values, sort=True)
+    return strike_codes, strikes
+
+def type_masks(df):
+    """Devuelve las máscaras numpy (is_call, is_put) de la columna Type."""
+    if isinstance(df['Type'].dtype, pd.CategoricalDtype):
+        # Los códigos de 'call' y 'put' se buscan en las categorías: no se asume el orden de TYPE_DTYPE
+        # (una categórica no ordenada con ['put', 'call'] es igual a TYPE_DTYPE al comparar dtypes)
+        codes = df['Type'].cat.codes.to_numpy()
+        call_code, put_code = df['Type'].cat.categories.get_indexer(['call', 'put'])
+        # Una categoría ausente (-1) no debe coincidir con los NaN, que también tienen código -1
+        return (codes == call_code) & (call_code >= 0), (codes == put_code) & (put_code >= 0)
+    type_values = df['Type'].to_numpy()
+    return type_values == 'call', type_values == 'put'
+
+def category_isin_mask(series, values):
+    """Máscara booleana (numpy) de pertenencia a values comparando los códigos de una columna categórica."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy()
+    value_codes = series.cat.categories.get_indexer(list(values))
+    return np.isin(series.cat.codes.to_numpy(), value_codes[value_codes >= 0])
+
 # --- Funciones de Cálculo de Métricas ---
 
-def calculate_put_call_ratio(df_griegas, group_by_strike=True):
-    """Calcula el Put/Call ratio para Volumen y Open Interest."""
+if njit is not None:
+    # Firma explícita con values en cualquier disposición (A): una vista de una sola fila es a la vez C y F
+    # contigua y Numba la tipa como C, así que sin firma se compilaría una segunda especialización
+    @njit('Tuple((float64[:, :], int64[:, :]))(float64[:, :], intp[:], intp)', cache=True)
+    def _sum_by_group(values, group_idx, n_groups):
+        """Suma cada columna de values (filas x métricas) en el grupo group_idx de su fila; omite NaN y códigos -1.
+
+        Devuelve (sumas, cuentas): cuentas es el número de valores no NaN que entraron en cada suma.
+        """
+        n_rows, n_cols = values.shape
+        out = np.zeros((n_groups, n_cols))
+        counts = np.zeros((n_groups, n_cols), dtype=np.int64)
+        # Columna por columna: cada recorrido interno lee una columna contigua (orden 'F') y acumula en su columna de out
+        for j in range(n_cols):
+            for i in range(n_rows):
+                code = group_idx[i]
+                value = values[i, j]
+                if code >= 0 and not np.isnan(value):
+                    out[code, j] += value
+                    counts[code, j] += 1
+        return out, counts
+else:
+    def _sum_by_group(values, group_idx, n_groups):
+        """Mismo resultado que el kernel de Numba con un np.bincount de sumas y otro de cuentas por columna."""
+        n_cols = values.shape[1]
+        out = np.zeros((n_groups, n_cols))
+        counts = np.zeros((n_groups, n_cols), dtype=np.int64)
+        has_group = group_idx >= 0
+        for j in range(n_cols):
+            column = values[:, j]
+            valid = has_group & ~np.isnan(column)
+            codes = group_idx[valid]
+            out[:, j] = np.bincount(codes, weights=column[valid], minlength=n_groups)
+            counts[:, j] = np.bincount(codes, minlength=n_groups)
+        return out, counts
+
+def warmup_kernels():
+    """Carga los kernels (con Numba, su única especialización ya compilada o del caché en disco) antes del primer cálculo."""
+    _sum_by_group(np.ones((2, 2), order='F'), np.array([0, 1], dtype=np.intp), 2)
+
+class StrikeAggs(NamedTuple):
+    """Sumas por strike de compute_strike_aggregates: arrays NumPy alineados con strike (None si faltan sus columnas)."""
+    strike: np.ndarray
+    call_volume: Optional[np.ndarray] = None
+    put_volume: Optional[np.ndarray] = None
+    call_oi: Optional[np.ndarray] = None
+    put_oi: Optional[np.ndarray] = None
+    dealer_gex: Optional[np.ndarray] = None
+    dealer_vega_exposure: Optional[np.ndarray] = None
+    dealer_theta_exposure: Optional[np.ndarray] = None
+    money_at_risk: Optional[np.ndarray] = None
+
+# Nombre de columna con el que cada campo de StrikeAggs se muestra en los DataFrames y tablas
+STRIKE_AGGS_COLUMNS = {'call_volume': 'CallVolume', 'put_volume': 'PutVolume', 'call_oi': 'CallOI', 'put_oi': 'PutOI',
+                       'dealer_gex': 'DealerGEX', 'dealer_vega_exposure': 'DealerVegaExposure',
+                       'dealer_theta_exposure': 'DealerThetaExposure', 'money_at_risk': 'MoneyAtRisk'}
+
+def compute_strike_aggregates(df_griegas):
+    """Calcula todas las sumas por strike (Volumen/OI por tipo, GEX, Vega, Theta y Dinero en Riesgo) en una sola pasada.
+
+    Cada métrica se incluye solo si el DataFrame tiene las columnas que necesita.
+    Devuelve un StrikeAggs con los strikes ordenados (o None si no hay nada que agregar);
+    los calculate_* son vistas de sus arrays.
+    """
+    if df_griegas is None or df_griegas.empty or 'Strike' not in df_griegas.columns:
+        return None
+
+    # Columnas de la matriz de métricas: campo de StrikeAggs -> (columna origen, factor, filtro de Type, NaN sin datos)
+    # Las de exposición son -Griega * OI * 100 (el dealer es la contraparte de los clientes) y el Dinero en Riesgo OI * MidPrice * 100
+    has = df_griegas.columns
+    specs = {}
+    if 'Type' in has:
+        for name, source in (('volume', 'Volume'), ('oi', 'OpenInterest')):
+            if source in has:
+                specs[f'call_{name}'] = (source, None, 'call', False)
+                specs[f'put_{name}'] = (source, None, 'put', False)
+    if 'OpenInterest' in has:
+        for greek, name in (('Gamma', 'dealer_gex'), ('Vega', 'dealer_vega_exposure'), ('Theta', 'dealer_theta_exposure')):
+            if greek in has:
+                specs[name] = (greek, -100.0, None, True)
+        if 'MidPrice' in has:
+            specs['money_at_risk'] = ('MidPrice', 100.0, None, False) # Multiplicador estándar de opciones
+
+    if not specs:
+        return None
+
+    # Cada columna se escribe directamente en la matriz (orden 'F', columnas contiguas) con ufuncs out=,
+    # sin arrays temporales por producto. Los NaN (griega, OI o MidPrice) se omiten luego en la suma;
+    # un MidPrice NaN aporta 0 al Dinero en Riesgo.
+    values = np.empty((len(df_griegas), len(specs)), order='F')
+    if 'Type' in has:
+        is_call, is_put = type_masks(df_griegas)
+    if 'OpenInterest' in has:
+        oi = df_griegas['OpenInterest'].to_numpy()
+    for j, (source, factor, option_type, _) in enumerate(specs.values()):
+        column = values[:, j]
+        source_values = df_griegas[source].to_numpy()
+        if option_type is not None:
+            column.fill(0)
+            np.copyto(column, source_values, where=is_call if option_type == 'call' else is_put)
+        else:
+            np.multiply(source_values, oi, out=column)
+            column *= factor
+
+    # Un único factorize (ordenado) de los strikes y la suma de todas las métricas en el kernel
+    strike_codes, strikes = factorize_strikes(df_griegas['Strike'])
+    sums, counts = _sum_by_group(values, strike_codes, strikes.size)
+    # Las exposiciones de un strike sin ninguna fila con griega y OI válidos quedan en NaN (no en 0),
+    # como si se hubiera hecho dropna(subset=[griega, 'OpenInterest']) antes de agrupar
+    nan_if_empty = np.array([spec[3] for spec in specs.values()])
+    sums[(counts == 0) & nan_if_empty] = np.nan
+    return StrikeAggs(strike=strikes, **{name: sums[:, j] for j, name in enumerate(specs)})
+
+def strike_aggregate_view(df_griegas, field, strike_aggregates=None):
+    """Devuelve un campo de compute_strike_aggregates como DataFrame Strike/columna (vacío si no se pudo calcular).
+
+    Los strikes en los que el campo es NaN (sin ningún dato válido) no se incluyen.
+    """
+    if strike_aggregates is None:
+        strike_aggregates = compute_strike_aggregates(df_griegas)
+    if strike_aggregates is None or getattr(strike_aggregates, field) is None:
+        return pd.DataFrame()
+    values = getattr(strike_aggregates, field)
+    has_data = ~np.isnan(values)
+    return pd.DataFrame({'Strike': strike_aggregates.strike[has_data], STRIKE_AGGS_COLUMNS[field]: values[has_data]})
+
+def aggregate_volume_oi_by_type(df_griegas, strike_aggregates=None):
+    """Suma Volumen y Open Interest de Calls y Puts por strike."""
+    if strike_aggregates is not None:
+        # Campos ausentes quedan como NaN, igual que un reindex de columnas
+        return pd.DataFrame({STRIKE_AGGS_COLUMNS[field]: getattr(strike_aggregates, field)
+                             if getattr(strike_aggregates, field) is not None else np.nan
+                             for field in ('call_volume', 'put_volume', 'call_oi', 'put_oi')},
+                            index=pd.Index(strike_aggregates.strike, name='Strike'))
+
+    # Sin agregados previos bastan cuatro bincount sobre los strikes factorizados (NaN cuenta como 0)
+    strike_codes, strikes = factorize_strikes(df_griegas['Strike'])
+    is_call, is_put = type_masks(df_griegas)
+    valid = strike_codes >= 0
+    is_call &= valid
+    is_put &= valid
+    volume = np.nan_to_num(df_griegas['Volume'].to_numpy(dtype=np.float64))
+    open_interest = np.nan_to_num(df_griegas['OpenInterest'].to_numpy(dtype=np.float64))
+    return pd.DataFrame({
+        'CallVolume': np.bincount(strike_codes[is_call], weights=volume[is_call], minlength=strikes.size),
+        'PutVolume': np.bincount(strike_codes[is_put], weights=volume[is_put], minlength=strikes.size),
+        'CallOI': np.bincount(strike_codes[is_call], weights=open_interest[is_call], minlength=strikes.size),
+        'PutOI': np.bincount(strike_codes[is_put], weights=open_interest[is_put], minlength=strikes.size)
+    }, index=pd.Index(strikes, name='Strike'))
+
+def calculate_put_call_ratio(df_griegas, group_by_strike=True, strike_aggregates=None):
+    """Calcula el Put/Call ratio para Volumen y Open Interest.
+
+    strike_aggregates permite reutilizar el resultado de compute_strike_aggregates para los ratios por strike;
+    el total siempre se suma sobre todas las filas, incluidas las de Strike NaN.
+    """
     if df_griegas is None or df_griegas.empty:
         return pd.DataFrame()
 
-    ratios = []
-
     if group_by_strike:
-        grouped = df_griegas.groupby('Strike')
+        sums = aggregate_volume_oi_by_type(df_griegas, strike_aggregates)
     else:
-        # Para un ratio total, creamos un grupo artificial
-        df_griegas['Total'] = 'Total'
-        grouped = df_griegas.groupby('Total')
-
-    for name, group in grouped:
-        puts_volume = group[group['Type'] == 'put']['Volume'].sum()
-        calls_volume = group[group['Type'] == 'call']['Volume'].sum()
-        puts_oi = group[group['Type'] == 'put']['OpenInterest'].sum()
-        calls_oi = group[group['Type'] == 'call']['OpenInterest'].sum()
-
-        pc_volume_ratio = puts_volume / calls_volume if calls_volume > 0 else np.nan
-        pc_oi_ratio = puts_oi / calls_oi if calls_oi > 0 else np.nan
-
-        if group_by_strike:
-            ratios.append({'Strike': name, 'PC_Volume_Ratio': pc_volume_ratio, 'PC_OI_Ratio': pc_oi_ratio})
-        else:
-            ratios.append({'Level': name, 'PC_Volume_Ratio': pc_volume_ratio, 'PC_OI_Ratio': pc_oi_ratio})
-
-    if not group_by_strike:
-         df_griegas.drop(columns=['Total'], inplace=True)
-
-    return pd.DataFrame(ratios)
-
-def calculate_money_at_risk(df_griegas):
+        # El total no necesita agrupar por strike: sumas enmascaradas directas
+        is_call, is_put = type_masks(df_griegas)
+        volume = df_griegas['Volume'].to_numpy(dtype=np.float64)
+        open_interest = df_griegas['OpenInterest'].to_numpy(dtype=np.float64)
+        sums = pd.DataFrame({'CallVolume': [np.nansum(volume[is_call])], 'PutVolume': [np.nansum(volume[is_put])],
+                             'CallOI': [np.nansum(open_interest[is_call])], 'PutOI': [np.nansum(open_interest[is_put])]},
+                            index=['Total'])
+
+    # Put / Call elemento a elemento; NaN donde no hay Calls
+    ratios = {}
+    for name, put_col, call_col in (('PC_Volume_Ratio', 'PutVolume', 'CallVolume'), ('PC_OI_Ratio', 'PutOI', 'CallOI')):
+        puts = sums[put_col].to_numpy(dtype=np.float64)
+        calls = sums[call_col].to_numpy(dtype=np.float64)
+        ratios[name] = np.divide(puts, calls, out=np.full_like(puts, np.nan), where=calls > 0)
+
+    ratios = pd.DataFrame(ratios, index=sums.index)
+    return ratios.rename_axis('Strike' if group_by_strike else 'Level').reset_index()
+
+def calculate_money_at_risk(df_griegas, strike_aggregates=None):
     """Calcula el Dinero en Riesgo por strike."""
     if df_griegas is None or df_griegas.empty or 'OpenInterest' not in df_griegas.columns or 'MidPrice' not in df_griegas.columns:
         return pd.DataFrame()
 
-    # Asegurarse que MidPrice no sea NaN para el cálculo, o reemplazar por 0 si es apropiado
-    df_griegas['MidPriceFilled'] = df_griegas['MidPrice'].fillna(0)
-    df_griegas['MoneyAtRisk'] = df_griegas['OpenInterest'] * df_griegas['MidPriceFilled'] * 100 # Multiplicador estándar de opciones
-
-    # Agrupar por strike
-    money_at_risk_strike = df_griegas.groupby('Strike')['MoneyAtRisk'].sum().reset_index()
-    return money_at_risk_strike
+    # OI * MidPrice * 100, con MidPrice NaN tratado como 0 (ver compute_strike_aggregates)
+    return strike_aggregate_view(df_griegas, 'money_at_risk', strike_aggregates)
 
 def calculate_max_pain(df_griegas):
     """Calcula el Max Pain strike."""
     if df_griegas is None or df_griegas.empty:
         return None
 
-    strikes = sorted(df_griegas['Strike'].unique())
-    max_pain_data = []
-
-    for current_strike_price_at_expiry in strikes:
-        total_loss = 0
-        # Para Calls: Pérdida si Strike < current_strike_price_at_expiry
-        # Valor intrínseco = current_strike_price_at_expiry - CallStrike
-        # Para Puts: Pérdida si Strike > current_strike_price_at_expiry
-        # Valor intrínseco = PutStrike - current_strike_price_at_expiry
-
-        # Filtrar por tipo y calcular el valor nocional de las opciones que expirarían OTM
-        # O más bien, el valor total de las opciones que *no* se ejercen (o se ejercen con pérdida para el comprador si consideramos la prima pagada)
-        # El concepto clásico de Max Pain es el strike donde el valor total en dólares de las opciones que expiran sin valor es máximo
-        # O, alternativamente, donde los vendedores de opciones (market makers) tienen la máxima ganancia.
-        # Esto significa que los compradores pierden la prima pagada.
-
-        # Simplificación: Suma del Open Interest de las opciones que expiran OTM, multiplicado por su prima (MidPrice)
-        # No, es el valor nocional de las opciones que expirarían con valor si el precio se mueve.
-        # Max Pain es el strike donde el valor total en dólares de las opciones que vencen es el mínimo.
-
-        # Para cada strike, calculamos el valor total de las opciones si el subyacente cierra en ESE strike.
-        # Los compradores de calls pierden si K > S. Los compradores de puts pierden si K < S.
-        # (K = Strike de la opción, S = Precio de ejercicio supuesto = current_strike_price_at_expiry)
-
-        # Valor total de las opciones en circulación si el precio de ejercicio es 'current_strike_price_at_expiry'
-        cash_value_at_strike = 0
-
-        # Calls
-        calls = df_griegas[df_griegas['Type'] == 'call']
-        # Valor intrínseco de las calls = max(0, S - K) * OI
-        cash_value_at_strike += (np.maximum(0, current_strike_price_at_expiry - calls['Strike']) * calls['OpenInterest']).sum()
+    # Max Pain es el strike donde el valor total en dólares de las opciones que vencen es el mínimo.
+    # Para cada strike, calculamos el valor total de las opciones si el subyacente cierra en ESE strike.
+    # Los compradores de calls pierden si K > S. Los compradores de puts pierden si K < S.
+    # (K = Strike de la opción, S = Precio de ejercicio supuesto)
+    # Valor intrínseco de las calls = max(0, S - K) * OI; de las puts = max(0, K - S) * OI
 
-        # Puts
-        puts = df_griegas[df_griegas['Type'] == 'put']
-        # Valor intrínseco de las puts = max(0, K - S) * OI
-        cash_value_at_strike += (np.maximum(0, puts['Strike'] - current_strike_price_at_expiry) * puts['OpenInterest']).sum()
-
-        max_pain_data.append({'StrikeAtExpiry': current_strike_price_at_expiry, 'TotalCashValue': cash_value_at_strike * 100}) # Multiplicador 100
-
-    if not max_pain_data:
+    # Agregar el OI por strike una sola vez y evaluar todos los strikes con dos productos matriz-vector
+    strike_codes, strikes = factorize_strikes(df_griegas['Strike'])
+    if strikes.size == 0:
+        return None
+    oi = df_griegas['OpenInterest'].to_numpy(dtype=np.float64)
+    is_call, is_put = type_masks(df_griegas)
+    # Solo cuentan las filas con Strike, Type y OpenInterest válidos (lo mismo que un dropna previo en esas columnas)
+    valid = (strike_codes >= 0) & ~np.isnan(oi)
+    is_call &= valid
+    is_put &= valid
+    oi_call = np.bincount(strike_codes[is_call], weights=oi[is_call], minlength=strikes.size)
+    oi_put = np.bincount(strike_codes[is_put], weights=oi[is_put], minlength=strikes.size)
+    # Los strikes candidatos son solo los que tienen alguna de esas filas
+    has_oi = np.bincount(strike_codes[is_call | is_put], minlength=strikes.size) > 0
+    if not has_oi.any():
         return None
+    strikes = strikes[has_oi].astype(np.float64, copy=False)
+    oi_call = oi_call[has_oi]
+    oi_put = oi_put[has_oi]
 
-    df_max_pain = pd.DataFrame(max_pain_data)
+    # call_payoff[i, j] = max(0, S_i - K_j); su traspuesta es el payoff de las puts, max(0, K_j - S_i)
+    call_payoff = np.maximum(0.0, strikes[:, None] - strikes[None, :])
+    total_cash_value = (call_payoff @ oi_call + call_payoff.T @ oi_put) * 100 # Multiplicador 100
     # El Max Pain strike es aquel que minimiza el valor total en efectivo de todas las opciones en circulación
-    max_pain_strike = df_max_pain.loc[df_max_pain['TotalCashValue'].idxmin()]['StrikeAtExpiry']
+    max_pain_strike = strikes[np.argmin(total_cash_value)]
 
     return max_pain_strike
 
@@ -256,7 +586,8 @@ def calculate_exposure(df_griegas, greek_column, exposure_name):
     # Vega Exposure = Vega * OI * 100 ($ por 1% cambio en IV)
     # Theta Exposure = Theta * OI * 100 ($ por día)
 
-    df_griegas[exposure_name] = df_griegas[greek_column] * df_griegas['OpenInterest'] * 100
+    # Producto sobre arrays NumPy locales: el DataFrame recibido (a menudo cacheado) no se modifica
+    exposure = df_griegas[greek_column].to_numpy(dtype=np.float64) * df_griegas['OpenInterest'].to_numpy(dtype=np.float64) * 100
 
     # Sumar la exposición por strike (considerando calls positivas y puts negativas para Gamma si es Delta Hedging)
     # Para GEX, Gamma de calls es positiva, Gamma de puts también es positiva (ambas aumentan convexidad)
@@ -264,10 +595,16 @@ def calculate_exposure(df_griegas, greek_column, exposure_name):
     # Para Theta y Vega, usualmente se suman sus valores absolutos o se miran por separado.
     # Aquí sumaremos directamente la exposición calculada.
 
-    exposure_strike = df_griegas.groupby('Strike')[exposure_name].sum().reset_index()
+    # Suma por strike con bincount sobre los strikes factorizados (los NaN no suman);
+    # los strikes sin ninguna exposición válida se omiten, como con un dropna previo
+    strike_codes, strikes = factorize_strikes(df_griegas['Strike'])
+    valid = (strike_codes >= 0) & ~np.isnan(exposure)
+    exposure_sums = np.bincount(strike_codes[valid], weights=exposure[valid], minlength=strikes.size)
+    has_data = np.bincount(strike_codes[valid], minlength=strikes.size) > 0
+    exposure_strike = pd.DataFrame({'Strike': strikes[has_data], exposure_name: exposure_sums[has_data]})
     return exposure_strike
 
-def calculate_gex(df_griegas):
+def calculate_gex(df_griegas, strike_aggregates=None):
     """Calcula la Exposición a Gamma (GEX)."""
     # Gamma es positiva para calls y puts.
     # GEX = (Gamma_call * OI_call - Gamma_put * OI_put * UnderlyingPrice^2 * 0.01)
@@ -298,22 +635,30 @@ def calculate_gex(df_griegas):
     # Para obtenerlo en $ por un cambio de 1% del subyacente: GEX * UnderlyingPrice * UnderlyingPrice * 0.01
     # Por ahora, calcularemos GEX en "acciones equivalentes".
 
-    df_griegas['GEX_ind'] = df_griegas['Gamma'] * df_griegas['OpenInterest'] * 100
     # Para el GEX que influye en la estabilidad (dealer GEX), se toma negativo si el dealer es short gamma.
     # Asumimos que el OI representa las posiciones de los clientes, y los dealers son la contraparte.
     # Así que el GEX del dealer es el negativo del GEX del cliente.
     # GEX_dealer_per_contract = -Gamma (ya que gamma de la opción es positiva)
     # GEX_dealer_total = sum(-Gamma_i * OI_i * 100)
-    df_griegas['DealerGEX'] = -df_griegas['Gamma'] * df_griegas['OpenInterest'] * 100 # Multiplicador 100
+    gex_per_strike = strike_aggregate_view(df_griegas, 'dealer_gex', strike_aggregates)
+    if gex_per_strike.empty:
+        return pd.DataFrame(), None
+
+    return summarize_gex(gex_per_strike)
 
-    gex_per_strike = df_griegas.groupby('Strike')['DealerGEX'].sum().reset_index()
 
+def summarize_gex(gex_per_strike):
+    """Ordena el DealerGEX por strike, añade el GEX acumulado y localiza el Gamma Flip Point."""
     # Gamma Flip Point: donde el GEX acumulado o el GEX neto cruza cero.
     # O más simple, el strike donde el GEX cambia de signo de forma más significativa,
     # o donde el GEX total (suma de todos los strikes) es cero.
     # Aquí, buscaremos el punto donde la suma acumulada de DealerGEX (ordenada por strike) cruza cero.
 
-    gex_per_strike_sorted = gex_per_strike.sort_values(by='Strike')
+    # Las vistas de compute_strike_aggregates ya llegan ordenadas por strike: solo se ordena si hace falta
+    if gex_per_strike['Strike'].is_monotonic_increasing:
+        gex_per_strike_sorted = gex_per_strike.reset_index(drop=True)
+    else:
+        gex_per_strike_sorted = gex_per_strike.sort_values(by='Strike', ignore_index=True)
     gex_per_strike_sorted['CumulativeDealerGEX'] = gex_per_strike_sorted['DealerGEX'].cumsum()
 
     # Encontrar el flip point:
@@ -332,44 +677,36 @@ def calculate_gex(df_griegas):
     # O el strike donde el GEX acumulado cambia de signo.
 
     gamma_flip_point = None
-    # Intentemos encontrar un cruce de cero en DealerGEX por strike
-    above_zero = gex_per_strike_sorted[gex_per_strike_sorted['DealerGEX'] > 0]
-    below_zero = gex_per_strike_sorted[gex_per_strike_sorted['DealerGEX'] < 0]
-
-    if not above_zero.empty and not below_zero.empty:
-        # Si hay GEX positivo y negativo, el flip está entre el strike más alto con GEX negativo
-        # y el strike más bajo con GEX positivo (o viceversa).
-        # O el strike donde DealerGEX está más cerca de cero.
-        closest_to_zero_strike = gex_per_strike_sorted.iloc[(gex_per_strike_sorted['DealerGEX']).abs().argsort()[:1]]
-        if not closest_to_zero_strike.empty:
-            gamma_flip_point = closest_to_zero_strike['Strike'].iloc[0]
-
-    # Si todos los GEX son del mismo signo, el "flip" es menos claro.
-    # Podría ser el strike con el GEX más cercano a cero.
-    if gamma_flip_point is None and not gex_per_strike_sorted.empty:
-        gamma_flip_point = gex_per_strike_sorted.loc[gex_per_strike_sorted['DealerGEX'].abs().idxmin()]['Strike']
-
+    dealer_gex = gex_per_strike_sorted['DealerGEX'].to_numpy(dtype=np.float64)
+    strikes = gex_per_strike_sorted['Strike'].to_numpy(dtype=np.float64)
+    if dealer_gex.size:
+        # Primer cambio de signo del DealerGEX entre strikes consecutivos (ceros exactos incluidos)
+        crossings = np.flatnonzero(np.diff(np.sign(dealer_gex)) != 0)
+        if crossings.size:
+            # Interpolación lineal entre los dos strikes del cruce para estimar el flip entre strikes
+            i = crossings[0]
+            g0, g1 = dealer_gex[i], dealer_gex[i + 1]
+            gamma_flip_point = float(strikes[i] - g0 * (strikes[i + 1] - strikes[i]) / (g1 - g0))
+        else:
+            # Si todos los GEX son del mismo signo, el "flip" es el strike con el GEX más cercano a cero
+            gamma_flip_point = float(strikes[np.argmin(np.abs(dealer_gex))])
 
     return gex_per_strike_sorted[['Strike', 'DealerGEX', 'CumulativeDealerGEX']], gamma_flip_point
 
 
-def calculate_vega_exposure(df_griegas):
+def calculate_vega_exposure(df_griegas, strike_aggregates=None):
     """Calcula la Exposición a Vega."""
     # Vega es positiva para calls y puts (para el comprador).
     # Exposición a Vega = Vega * OI * 100 ($ por cambio de 1 punto porcentual en IV)
     # Si los dealers son short vega, entonces la exposición del dealer es -Vega.
-    df_griegas['DealerVegaExposure'] = -df_griegas['Vega'] * df_griegas['OpenInterest'] * 100
-    vega_exposure_strike = df_griegas.groupby('Strike')['DealerVegaExposure'].sum().reset_index()
-    return vega_exposure_strike
+    return strike_aggregate_view(df_griegas, 'dealer_vega_exposure', strike_aggregates)
 
-def calculate_theta_exposure(df_griegas):
+def calculate_theta_exposure(df_griegas, strike_aggregates=None):
     """Calcula la Exposición a Theta."""
     # Theta es negativa para calls y puts (para el comprador, el tiempo erosiona el valor).
     # Exposición a Theta (para el comprador) = Theta * OI * 100 ($ por día que pasa)
     # Si los dealers son short opciones (long theta), entonces la exposición del dealer es -Theta (positivo).
-    df_griegas['DealerThetaExposure'] = -df_griegas['Theta'] * df_griegas['OpenInterest'] * 100
-    theta_exposure_strike = df_griegas.groupby('Strike')['DealerThetaExposure'].sum().reset_index()
-    return theta_exposure_strike
+    return strike_aggregate_view(df_griegas, 'dealer_theta_exposure', strike_aggregates)
 
 
 if __name__ == '__main__':
@@ -383,7 +720,12 @@ if __name__ == '__main__':
 
         print("\n--- Calculando Métricas ---")
 
-        pc_ratios_strike = calculate_put_call_ratio(df_griegas, group_by_strike=True)
+        # Una sola agregación por strike compartida por todas las métricas, sin un dropna por métrica:
+        # los NaN se omiten en las sumas y los strikes sin ninguna griega/OI válida quedan fuera de las exposiciones.
+        # Volumen, OI y Dinero en Riesgo suman 0 en esos strikes, igual que el groupby original.
+        strike_aggregates = compute_strike_aggregates(df_griegas)
+
+        pc_ratios_strike = calculate_put_call_ratio(df_griegas, group_by_strike=True, strike_aggregates=strike_aggregates)
         print("\nPut/Call Ratios por Strike:")
         print(pc_ratios_strike.head().to_markdown(index=False))
 
@@ -391,25 +733,24 @@ if __name__ == '__main__':
         print("\nPut/Call Ratios Total:")
         print(pc_ratios_total.to_markdown(index=False))
 
-        money_at_risk = calculate_money_at_risk(df_griegas)
+        money_at_risk = calculate_money_at_risk(df_griegas, strike_aggregates)
         print("\nDinero en Riesgo por Strike:")
         print(money_at_risk.head().to_markdown(index=False))
 
-        # Asegurarse de que no haya NaNs en columnas críticas para Max Pain
-        # df_griegas_max_pain = df_griegas.dropna(subset=['Strike', 'Type', 'OpenInterest'])
-        max_pain_strike = calculate_max_pain(df_griegas.dropna(subset=['Strike', 'Type', 'OpenInterest']))
+        # calculate_max_pain solo considera las filas con Strike, Type y OpenInterest válidos
+        max_pain_strike = calculate_max_pain(df_griegas)
         print(f"\nMax Pain Strike: {max_pain_strike}")
 
-        gex_exposure, gamma_flip_point = calculate_gex(df_griegas.dropna(subset=['Strike', 'Gamma', 'OpenInterest']))
+        gex_exposure, gamma_flip_point = calculate_gex(df_griegas, strike_aggregates)
         print("\nExposición a Gamma (Dealer GEX) por Strike:")
         print(gex_exposure.head().to_markdown(index=False))
         print(f"Gamma Flip Point: {gamma_flip_point}")
 
-        vega_exposure = calculate_vega_exposure(df_griegas.dropna(subset=['Strike', 'Vega', 'OpenInterest']))
+        vega_exposure = calculate_vega_exposure(df_griegas, strike_aggregates)
         print("\nExposición a Vega (Dealer) por Strike:")
         print(vega_exposure.head().to_markdown(index=False))
 
-        theta_exposure = calculate_theta_exposure(df_griegas.dropna(subset=['Strike', 'Theta', 'OpenInterest']))
+        theta_exposure = calculate_theta_exposure(df_griegas, strike_aggregates)
         print("\nExposición a Theta (Dealer) por Strike:")
         print(theta_exposure.head().to_markdown(index=False))
 